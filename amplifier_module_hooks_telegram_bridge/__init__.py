@@ -27,6 +27,11 @@ async def mount(coordinator: ModuleCoordinator, config: dict[str, Any] | None =
         pairing_file: Path to pairing.json (default: .amplifier/telegram_pairing.json)
         send_timeout: Timeout for send requests in seconds (default: 5)
         reconnect_interval: Interval for retry loop in seconds (default: 60)
+        chat_event_rate: Sustained events per second sent to each chat, dropping the rest
+            (default: no limit; capped at the 1.0/s send rate)
+        chat_event_burst: Events per chat allowed back-to-back before dropping, with chat_event_rate
+            (default and cap: what send pacing clears within send_timeout, 8 by default)
+        max_pending_sends: In-flight background sends before new events are dropped (default: 128)
         events: List of events to observe (default: session:start, prompt:submit, etc.)
 
     Returns:
@@ -71,8 +76,13 @@ async def mount(coordinator: ModuleCoordinator, config: dict[str, Any] | None =
             # Stop reconnect task
             import asyncio
 
-            if asyncio.get_event_loop().is_running():
-                asyncio.create_task(hook.stop_reconnect_task())
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # No running loop - the reconnect task went with it, just release the HTTP session
+                hook.telegram_client.close()
+            else:
+                loop.create_task(hook.stop_reconnect_task())
 
             logger.info("Cleaned up TelegramBridgeHook")
 
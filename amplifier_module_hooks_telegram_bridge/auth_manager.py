@@ -1,18 +1,48 @@
 """
 Shared authorization manager for Telegram bridge modules.
-Reads pairing.json to determine authorized users.
+Reads pairing.json (plus its pairing.jsonl change log) to determine authorized users.
 """
 
-import json
+import functools
 import logging
+import os
+import time
 from datetime import datetime
 from pathlib import Path
 
+import orjson
 from pydantic import BaseModel
 from pydantic import Field
 
 logger = logging.getLogger(__name__)
 
+# O_CLOEXEC is POSIX-only, O_BINARY Windows-only
+_READ_FLAGS = os.O_RDONLY | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0)
+
+
+def _read_bytes(path: str) -> bytes:
+    """Read a small file with raw os.read calls, skipping Python's buffered file objects."""
+    fd = os.open(path, _READ_FLAGS)
+    try:
+        data = os.read(fd, os.fstat(fd).st_size or 4096)
+        # Short read, or the file grew since fstat
+        while chunk := os.read(fd, 65536):
+            data += chunk
+        return data
+    finally:
+        os.close(fd)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_snapshot(path: str, ino: int, mtime_ns: int, size: int) -> dict:
+    """
+    Parse a pairing snapshot, shared across AuthManager instances.
+
+    Keyed on the file's inode, mtime and size, so a rewritten file misses the cache.
+    The result is shared - callers must treat it as read-only.
+    """
+    return orjson.loads(_read_bytes(path))
+
 
 class AuthorizedUser(BaseModel):
     """Represents an authorized Telegram user."""
@@ -39,16 +69,72 @@ class PairingFile(BaseModel):
 
 
 class AuthManager:
-    """Manages authorization for Telegram bridge."""
-
-    def __init__(self, pairing_file: Path):
+    """
+    Manages authorization for Telegram bridge.
+
+    pairing.json is authoritative for who is paired: the tool module reads and
+    rewrites only that file, so adding or removing a user rewrites it atomically.
+    Failed-attempt bookkeeping is appended to a sibling pairing.jsonl log instead
+    and replayed over the snapshot on load. The log is folded back into the
+    snapshot once it reaches compact_threshold records.
+
+    The log's first record names the snapshot (inode, mtime, size) it was written
+    against. A log whose header doesn't match the current pairing.json - left over
+    from an interrupted compaction, or predating an external rewrite - is ignored
+    and replaced on the next mutation, so its records never replay over a
+    snapshot they weren't meant for.
+    """
+
+    def __init__(
+        self,
+        pairing_file: Path,
+        compact_threshold: int = 100,
+        cache_ttl: float = 1.0,
+        event_rate: float | None = None,
+        event_burst: int = 8,
+    ):
         """
         Initialize auth manager.
 
         Args:
             pairing_file: Path to pairing.json file
+            compact_threshold: Log records before compacting into the snapshot
+            cache_ttl: Seconds to trust the in-memory view before re-checking the files
+            event_rate: Sustained events per second delivered to each chat (None: no limit)
+            event_burst: Events a chat may receive back-to-back before event_rate applies
         """
         self.pairing_file = pairing_file
+        self.log_file = pairing_file.with_suffix(".jsonl")
+        self.compact_threshold = compact_threshold
+        self.cache_ttl = cache_ttl
+        self.event_rate = event_rate
+        self.event_burst = event_burst
+
+        # Per-chat event token buckets as integer nanoseconds: [credit, last refill
+        # time.monotonic_ns()]. One token costs _event_cost_ns of credit, so refill
+        # is just the elapsed time.
+        self._event_cost_ns = round(1_000_000_000 / event_rate) if event_rate else 0
+        self._event_capacity_ns = event_burst * self._event_cost_ns
+        self._buckets: dict[int, list[int]] = {}
+
+        # Materialized view of snapshot + log
+        self._version = "1.0"
+        self._users: dict[int, dict] = {}
+        self._rate_limits: dict[str, dict] = {}
+        # blocked_until per user key as a time.monotonic() deadline
+        self._blocked_until: dict[str, float] = {}
+        self._user_ids: frozenset[int] = frozenset()
+        self._chat_ids: frozenset[int] = frozenset()
+        self._target_chat_ids: tuple[int, ...] = ()
+        self._has_users = False
+        self._log_entries = 0
+        # Log on disk doesn't belong to the current snapshot (ignored by the view)
+        self._log_stale = False
+
+        # (snapshot inode, mtime, size, log size) the view was built from, and when it was last checked
+        self._cache_key: tuple[int, int, int, int] | None = None
+        self._checked_at = 0.0
+
         self._ensure_file_exists()
 
     def _ensure_file_exists(self) -> None:
@@ -56,10 +142,215 @@ class AuthManager:
         if not self.pairing_file.exists():
             self.pairing_file.parent.mkdir(parents=True, exist_ok=True)
             default_pairing = PairingFile()
-            self.pairing_file.write_text(json.dumps(default_pairing.model_dump(), indent=2))
+            self._write_snapshot(default_pairing)
             logger.info(f"Created default pairing file at {self.pairing_file}")
 
-    def get_authorized_users(self) -> set[int]:
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        """Write a file atomically: fsync a temp file, then os.replace it into place."""
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _write_snapshot(self, pairing: PairingFile) -> None:
+        """Write pairing.json atomically."""
+        self._write_atomic(self.pairing_file, orjson.dumps(pairing.model_dump(), option=orjson.OPT_INDENT_2))
+
+    def _current_key(self) -> tuple[int, int, int, int]:
+        """Get (snapshot inode, mtime, size, log size) for cache validation."""
+        try:
+            log_size = os.stat(self.log_file).st_size
+        except FileNotFoundError:
+            log_size = 0
+        snapshot = os.stat(self.pairing_file)
+        return snapshot.st_ino, snapshot.st_mtime_ns, snapshot.st_size, log_size
+
+    def _log_header(self) -> bytes:
+        """Serialize the header record tying the log to the snapshot in the view."""
+        return orjson.dumps({"op": "base", "snapshot": self._cache_key[:3]}) + b"\n"
+
+    def _load(self, force: bool = False) -> None:
+        """
+        Refresh the materialized view if the snapshot or log changed on disk.
+
+        Files are stat'ed at most once per cache_ttl, so bursts of events share one
+        check; external edits become visible within cache_ttl. The snapshot is
+        walked as plain JSON; models are only used on the write path.
+
+        Args:
+            force: Re-check the files even within cache_ttl (before mutations)
+        """
+        now = time.monotonic()
+        if not force and self._cache_key is not None and now - self._checked_at < self.cache_ttl:
+            return
+
+        key = self._current_key()
+        self._checked_at = now
+        if key == self._cache_key:
+            return
+
+        pairing_data = _load_snapshot(str(self.pairing_file), *key[:3])
+        self._version = pairing_data.get("version", "1.0")
+        self._users = {user["user_id"]: user for user in pairing_data.get("authorized_users", ())}
+        self._rate_limits = dict(pairing_data.get("rate_limits", {}))
+        self._blocked_until = {}
+        for user_key, rate_limit in self._rate_limits.items():
+            self._set_block(user_key, rate_limit.get("blocked_until"))
+
+        self._log_entries = 0
+        self._log_stale = False
+        if key[3]:
+            with open(self.log_file, "rb") as f:
+                header = None
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = orjson.loads(line)
+                    except ValueError:
+                        # Torn trailing write - everything before it is still valid
+                        logger.warning(f"Skipping malformed record in {self.log_file}")
+                        continue
+                    if header is None:
+                        header = record
+                        if record.get("op") != "base" or tuple(record.get("snapshot", ())) != key[:3]:
+                            logger.warning(f"{self.log_file} was not written against the current snapshot, ignoring it")
+                            self._log_stale = True
+                            break
+                        continue
+                    self._apply(record)
+                    self._log_entries += 1
+
+        self._refresh_ids()
+        self._cache_key = key
+
+    def _apply(self, record: dict) -> None:
+        """Apply a single log record to the materialized view (plain dicts, no validation)."""
+        op = record["op"]
+        if op == "add":
+            user = record["user"]
+            self._users[user["user_id"]] = user
+        elif op == "remove":
+            self._users.pop(record["user_id"], None)
+        elif op == "fail":
+            user_key = str(record["user_id"])
+            previous = self._rate_limits.get(user_key, {})
+            self._rate_limits[user_key] = {
+                "failed_attempts": previous.get("failed_attempts", 0) + 1,
+                "blocked_until": record.get("blocked_until") or previous.get("blocked_until"),
+            }
+            self._set_block(user_key, record.get("blocked_until"))
+        elif op == "clear":
+            self._rate_limits[str(record["user_id"])] = {"failed_attempts": 0, "blocked_until": None}
+            self._blocked_until.pop(str(record["user_id"]), None)
+        elif op == "base":
+            # Header repeated by a concurrent first write against the same snapshot
+            pass
+        else:
+            logger.warning(f"Unknown pairing log op: {op}")
+
+    def _set_block(self, user_key: str, blocked_until: str | None) -> None:
+        """
+        Record a persisted block as a time.monotonic() deadline.
+
+        An unparseable deadline only affects that user (logged, left unblocked) -
+        it must not fail the load for everyone else.
+        """
+        if not blocked_until:
+            return
+        try:
+            # timestamp() handles both naive (local time) and timezone-aware deadlines
+            remaining = datetime.fromisoformat(blocked_until).timestamp() - time.time()
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring invalid blocked_until for user {user_key}: {e}")
+            return
+        self._blocked_until[user_key] = time.monotonic() + remaining
+
+    def _refresh_ids(self) -> None:
+        """Rebuild derived ID sets from the view."""
+        self._user_ids = frozenset(self._users)
+        # Pairing order, one entry per chat even if several users share it
+        self._target_chat_ids = tuple(dict.fromkeys(user["chat_id"] for user in self._users.values()))
+        self._chat_ids = frozenset(self._target_chat_ids)
+        self._has_users = bool(self._users)
+
+    def _append(self, record: dict) -> None:
+        """
+        Append record to the log (durably), then apply it to the view.
+
+        Callers must have just run _load(force=True), so the view and its header
+        match the files on disk.
+        """
+        line = orjson.dumps(record) + b"\n"
+        if self._log_stale:
+            # Replace the leftover log with a fresh one for the current snapshot
+            line = self._log_header() + line
+            self._write_atomic(self.log_file, line)
+            log_size = len(line)
+            self._log_stale = False
+            self._cache_key = (*self._cache_key[:3], 0)
+        else:
+            with open(self.log_file, "ab") as f:
+                if f.tell() == 0:
+                    line = self._log_header() + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                log_size = f.tell()
+        self._log_entries += 1
+
+        self._apply(record)
+        self._refresh_ids()
+
+        if log_size - len(line) == self._cache_key[3]:
+            # The view already reflects the rest of the log and our own write - no need to replay it
+            self._cache_key = (*self._cache_key[:3], log_size)
+        else:
+            # Someone else appended since our last replay - replay on the next read
+            self._cache_key = None
+
+        if self._log_entries >= self.compact_threshold:
+            self.compact()
+
+    def _rewrite(self, record: dict) -> None:
+        """
+        Apply an authorization change to the view and write it straight into pairing.json.
+
+        Callers must have just run _load(force=True). Pending log records are folded
+        in at the same time.
+        """
+        self._apply(record)
+        self._refresh_ids()
+        self._write_view()
+
+    def compact(self) -> None:
+        """Fold the log into the snapshot and truncate the log."""
+        self._load(force=True)
+        self._write_view()
+        logger.info(f"Compacted pairing log into {self.pairing_file}")
+
+    def _write_view(self) -> None:
+        """Write the view as the new snapshot and truncate the log."""
+        pairing = PairingFile(
+            version=self._version,
+            authorized_users=list(self._users.values()),
+            rate_limits=self._rate_limits,
+        )
+
+        # Replacing the snapshot is the commit point: from then on the old log's
+        # header no longer matches, so a crash before the truncate below can't
+        # replay its records (fail in particular isn't idempotent) a second time.
+        self._write_snapshot(pairing)
+        self.log_file.write_bytes(b"")
+
+        self._log_entries = 0
+        self._log_stale = False
+        self._cache_key = self._current_key()
+
+    def get_authorized_users(self) -> frozenset[int]:
         """
         Get set of authorized user IDs.
 
@@ -67,12 +358,25 @@ class AuthManager:
             Set of authorized user IDs
         """
         try:
-            pairing_data = json.loads(self.pairing_file.read_text())
-            pairing = PairingFile(**pairing_data)
-            return {user.user_id for user in pairing.authorized_users}
+            self._load()
+            return self._user_ids
         except Exception as e:
             logger.error(f"Error reading pairing file: {e}")
-            return set()
+            return frozenset()
+
+    def has_users(self) -> bool:
+        """
+        Check if anyone is paired at all.
+
+        Returns:
+            True if at least one user is authorized, False otherwise
+        """
+        try:
+            self._load()
+            return self._has_users
+        except Exception as e:
+            logger.error(f"Error reading pairing file: {e}")
+            return False
 
     def is_authorized(self, user_id: int) -> bool:
         """
@@ -84,9 +388,14 @@ class AuthManager:
         Returns:
             True if authorized, False otherwise
         """
-        return user_id in self.get_authorized_users()
+        try:
+            self._load()
+            return user_id in self._users
+        except Exception as e:
+            logger.error(f"Error reading pairing file: {e}")
+            return False
 
-    def get_chat_ids(self) -> set[int]:
+    def get_chat_ids(self) -> frozenset[int]:
         """
         Get set of authorized chat IDs.
 
@@ -94,12 +403,52 @@ class AuthManager:
             Set of authorized chat IDs
         """
         try:
-            pairing_data = json.loads(self.pairing_file.read_text())
-            pairing = PairingFile(**pairing_data)
-            return {user.chat_id for user in pairing.authorized_users}
+            self._load()
+            return self._chat_ids
+        except Exception as e:
+            logger.error(f"Error reading pairing file: {e}")
+            return frozenset()
+
+    def target_chat_ids(self) -> tuple[int, ...]:
+        """
+        Get authorized chat IDs to fan events out to.
+
+        Returns:
+            Tuple of distinct chat IDs, in pairing order
+        """
+        try:
+            self._load()
+            return self._target_chat_ids
         except Exception as e:
             logger.error(f"Error reading pairing file: {e}")
-            return set()
+            return ()
+
+    def allow(self, chat_id: int) -> bool:
+        """
+        Take one event token for a chat (lazily refilled token bucket).
+
+        Args:
+            chat_id: Telegram chat ID
+
+        Returns:
+            True if the chat is within its event rate, False if it should be skipped
+        """
+        if self.event_rate is None:
+            return True
+
+        now = time.monotonic_ns()
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = [self._event_capacity_ns, now]
+
+        credit = min(self._event_capacity_ns, bucket[0] + now - bucket[1])
+        bucket[1] = now
+
+        if credit >= self._event_cost_ns:
+            bucket[0] = credit - self._event_cost_ns
+            return True
+        bucket[0] = credit
+        return False
 
     def add_user(self, user_id: int, chat_id: int, username: str | None = None) -> bool:
         """
@@ -114,11 +463,10 @@ class AuthManager:
             True if successful, False otherwise
         """
         try:
-            pairing_data = json.loads(self.pairing_file.read_text())
-            pairing = PairingFile(**pairing_data)
+            self._load(force=True)
 
             # Check if already authorized
-            if any(user.user_id == user_id for user in pairing.authorized_users):
+            if user_id in self._users:
                 logger.info(f"User {user_id} already authorized")
                 return True
 
@@ -126,10 +474,7 @@ class AuthManager:
             new_user = AuthorizedUser(
                 user_id=user_id, chat_id=chat_id, username=username, paired_at=datetime.now().isoformat()
             )
-            pairing.authorized_users.append(new_user)
-
-            # Save
-            self.pairing_file.write_text(json.dumps(pairing.model_dump(), indent=2))
+            self._rewrite({"op": "add", "user": new_user.model_dump()})
             logger.info(f"Added user {user_id} ({username}) to authorized users")
             return True
 
@@ -148,19 +493,13 @@ class AuthManager:
             True if successful, False otherwise
         """
         try:
-            pairing_data = json.loads(self.pairing_file.read_text())
-            pairing = PairingFile(**pairing_data)
+            self._load(force=True)
 
-            # Filter out user
-            original_count = len(pairing.authorized_users)
-            pairing.authorized_users = [user for user in pairing.authorized_users if user.user_id != user_id]
-
-            if len(pairing.authorized_users) == original_count:
+            if user_id not in self._users:
                 logger.warning(f"User {user_id} not found in authorized users")
                 return False
 
-            # Save
-            self.pairing_file.write_text(json.dumps(pairing.model_dump(), indent=2))
+            self._rewrite({"op": "remove", "user_id": user_id})
             logger.info(f"Removed user {user_id} from authorized users")
             return True
 
@@ -179,23 +518,17 @@ class AuthManager:
             True if rate limited, False otherwise
         """
         try:
-            pairing_data = json.loads(self.pairing_file.read_text())
-            pairing = PairingFile(**pairing_data)
-
-            user_key = str(user_id)
-            if user_key not in pairing.rate_limits:
+            self._load()
+            blocked_until = self._blocked_until.get(str(user_id))
+            if blocked_until is None:
                 return False
 
-            rate_limit = pairing.rate_limits[user_key]
-            if rate_limit.blocked_until:
-                blocked_until = datetime.fromisoformat(rate_limit.blocked_until)
-                if datetime.now() < blocked_until:
-                    return True
-                # Expired - clear block
-                rate_limit.blocked_until = None
-                rate_limit.failed_attempts = 0
-                self.pairing_file.write_text(json.dumps(pairing.model_dump(), indent=2))
+            if time.monotonic() < blocked_until:
+                return True
 
+            # Expired - clear block
+            self._load(force=True)
+            self._append({"op": "clear", "user_id": user_id})
             return False
 
         except Exception as e:
@@ -212,24 +545,19 @@ class AuthManager:
             block_duration_hours: Hours to block after max attempts
         """
         try:
-            pairing_data = json.loads(self.pairing_file.read_text())
-            pairing = PairingFile(**pairing_data)
-
-            user_key = str(user_id)
-            if user_key not in pairing.rate_limits:
-                pairing.rate_limits[user_key] = RateLimit()
+            self._load(force=True)
 
-            rate_limit = pairing.rate_limits[user_key]
-            rate_limit.failed_attempts += 1
+            rate_limit = self._rate_limits.get(str(user_id), {})
+            record = {"op": "fail", "user_id": user_id, "blocked_until": None}
 
-            if rate_limit.failed_attempts >= max_attempts:
+            if rate_limit.get("failed_attempts", 0) + 1 >= max_attempts:
                 from datetime import timedelta
 
                 blocked_until = datetime.now() + timedelta(hours=block_duration_hours)
-                rate_limit.blocked_until = blocked_until.isoformat()
-                logger.warning(f"User {user_id} blocked until {rate_limit.blocked_until}")
+                record["blocked_until"] = blocked_until.isoformat()
+                logger.warning(f"User {user_id} blocked until {record['blocked_until']}")
 
-            self.pairing_file.write_text(json.dumps(pairing.model_dump(), indent=2))
+            self._append(record)
 
         except Exception as e:
             logger.error(f"Error recording failed attempt: {e}")
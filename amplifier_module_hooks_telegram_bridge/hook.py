@@ -4,18 +4,20 @@ Telegram Bridge Hook - observes Amplifier events and pushes to Telegram.
 
 import asyncio
 import logging
+import sys
+import time
 from pathlib import Path
 from typing import Any
+from typing import Final
 
 from amplifier_core import HookRegistry
 from amplifier_core import HookResult
 
-from .auth_manager import AuthManager
-from .message_formatter import MessageFormatter
-from .telegram_client import TelegramClient
-
 logger = logging.getLogger(__name__)
 
+# Shared result for the common path - the registry only reads it, so never mutate it
+_CONTINUE: Final = HookResult(action="continue")
+
 
 class TelegramBridgeHook:
     """Hook that bridges Amplifier events to Telegram."""
@@ -30,6 +32,9 @@ class TelegramBridgeHook:
         HookRegistry.TOOL_POST,
     ]
 
+    # Seconds between "chat over its event rate" warnings for the same chat
+    THROTTLE_LOG_INTERVAL = 60.0
+
     def __init__(self, config: dict[str, Any]):
         """
         Initialize Telegram bridge hook.
@@ -37,6 +42,11 @@ class TelegramBridgeHook:
         Args:
             config: Hook configuration
         """
+        # Deferred so enumerating modules doesn't pay for requests/orjson
+        from .auth_manager import AuthManager
+        from .message_formatter import MessageFormatter
+        from .telegram_client import TelegramClient
+
         self.config = config
 
         # Required config
@@ -45,39 +55,79 @@ class TelegramBridgeHook:
             raise ValueError("bot_token is required in config")
 
         # Initialize components
-        pairing_file = Path(config.get("pairing_file", ".amplifier/telegram_pairing.json"))
-        self.auth_manager = AuthManager(pairing_file)
-
-        send_timeout = config.get("send_timeout", 5)
+        self.send_timeout = config.get("send_timeout", 5)
         reconnect_interval = config.get("reconnect_interval", 60)
 
-        self.telegram_client = TelegramClient(bot_token=bot_token, send_timeout=send_timeout)
+        self.telegram_client = TelegramClient(bot_token=bot_token, send_timeout=self.send_timeout)
+
+        # Per-chat event dropping is opt-in via chat_event_rate. When enabled, rate
+        # and burst are capped at what the client's send pacing clears within
+        # about send_timeout - events beyond that couldn't go out in time anyway.
+        event_rate = None
+        chat_rate = self.telegram_client.chat_rate
+        max_burst = self.telegram_client.chat_burst + int(self.send_timeout * chat_rate)
+        event_burst = max_burst
+        if "chat_event_rate" in config:
+            requested = (config["chat_event_rate"], config.get("chat_event_burst", max_burst))
+            event_rate, event_burst = min(requested[0], chat_rate), min(requested[1], max_burst)
+            if (event_rate, event_burst) != requested:
+                logger.warning(f"Capping per-chat event rate/burst at {event_rate}/s, {event_burst} to match send pacing")
+
+        pairing_file = Path(config.get("pairing_file", ".amplifier/telegram_pairing.json"))
+        self.auth_manager = AuthManager(pairing_file, event_rate=event_rate, event_burst=event_burst)
+        # Last time.monotonic() a throttled-chat drop was logged, per chat
+        self._throttle_logged: dict[int, float] = {}
 
         self.message_formatter = MessageFormatter()
 
-        # Events to observe
-        self.events = set(config.get("events", self.DEFAULT_EVENTS))
+        # Events to observe (interned so membership checks usually hit on identity)
+        self.events = frozenset(sys.intern(event) for event in config.get("events", self.DEFAULT_EVENTS))
 
         # Reconnection
         self.reconnect_interval = reconnect_interval
         self._reconnect_task: asyncio.Task | None = None
 
+        # In-flight background sends (bounded for backpressure)
+        self.max_pending_sends = config.get("max_pending_sends", 128)
+        self._pending: set[asyncio.Task] = set()
+        # Per chat, resolved once the latest scheduled send to it finishes - the
+        # next event's send to that chat waits on it, keeping events in order
+        self._chat_tails: dict[int, asyncio.Future] = {}
+
     async def start_reconnect_task(self) -> None:
         """Start background task to retry queued messages."""
         if self._reconnect_task is None or self._reconnect_task.done():
             self._reconnect_task = asyncio.create_task(self._reconnect_loop())
             logger.info("Started reconnect task")
 
+    async def flush(self, timeout: float | None = None) -> None:
+        """
+        Wait for in-flight sends, cancelling any still running after timeout.
+
+        Args:
+            timeout: Seconds to wait (None waits for all)
+        """
+        if not self._pending:
+            return
+
+        _, still_running = await asyncio.wait(set(self._pending), timeout=timeout)
+        for task in still_running:
+            task.cancel()
+
     async def stop_reconnect_task(self) -> None:
-        """Stop background reconnect task."""
+        """Stop background reconnect task, giving in-flight sends a chance to finish."""
         import contextlib
 
+        await self.flush(timeout=self.send_timeout)
+
         if self._reconnect_task and not self._reconnect_task.done():
             self._reconnect_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await self._reconnect_task
             logger.info("Stopped reconnect task")
 
+        self.telegram_client.close()
+
     async def _reconnect_loop(self) -> None:
         """Background loop to retry queued messages."""
         while True:
@@ -88,9 +138,7 @@ class TelegramBridgeHook:
                 if queue_status["queued_messages"] > 0:
                     logger.info(f"Retrying {queue_status['queued_messages']} queued messages...")
 
-                    # Run retry in executor (sync function)
-                    loop = asyncio.get_event_loop()
-                    sent_count = await loop.run_in_executor(None, self.telegram_client.retry_queue)
+                    sent_count = await self.telegram_client.retry_queue()
 
                     if sent_count > 0:
                         logger.info(f"Successfully sent {sent_count} queued messages")
@@ -101,10 +149,99 @@ class TelegramBridgeHook:
             except Exception as e:
                 logger.error(f"Error in reconnect loop: {e}")
 
+    async def _send_one(self, event: str, chat_id: int, chunk: str) -> None:
+        """
+        Send one message chunk with timeout, logging instead of raising.
+
+        The deadline is send_timeout on top of the client's current rate-limit
+        wait for the chat, so paced sends aren't cut short but a hung one is.
+
+        Args:
+            event: Event name (for logging)
+            chat_id: Telegram chat ID
+            chunk: Message text
+        """
+        try:
+            success = await asyncio.wait_for(
+                self.telegram_client.async_send_message(chat_id, chunk),
+                timeout=self.send_timeout + self.telegram_client.pacing_delay(chat_id),
+            )
+
+            if success:
+                logger.debug(f"Sent event {event} to chat {chat_id}")
+            else:
+                logger.warning(f"Failed to send event {event} to chat {chat_id} (queued for retry)")
+
+        except TimeoutError:
+            logger.warning(f"Timeout sending event {event} to chat {chat_id}")
+        except Exception as e:
+            logger.error(f"Error sending to chat {chat_id}: {e}")
+
+    def _chain(self, chat_id: int) -> tuple[asyncio.Future | None, asyncio.Future]:
+        """
+        Reserve the next send slot for a chat.
+
+        Returns:
+            (future to wait on before sending, or None; future to resolve when done)
+        """
+        done = asyncio.get_running_loop().create_future()
+        after = self._chat_tails.get(chat_id)
+        self._chat_tails[chat_id] = done
+        return after, done
+
+    def _release(self, chat_id: int, after: asyncio.Future | None, done: asyncio.Future) -> None:
+        """Let the chat's next send go ahead once this one and the one before it are finished (idempotent)."""
+        if after is not None and not after.done():
+            # Cancelled while waiting - the next send still waits for the one before us
+            after.add_done_callback(lambda _: self._release(chat_id, None, done))
+            return
+        if not done.done():
+            done.set_result(None)
+        if self._chat_tails.get(chat_id) is done:
+            del self._chat_tails[chat_id]
+
+    async def _send_to_chat(
+        self, event: str, chat_id: int, chunks: list[str], after: asyncio.Future | None, done: asyncio.Future
+    ) -> None:
+        """Send chunks to one chat in order, after the chat's previous event (chats run concurrently)."""
+        try:
+            if after is not None:
+                await asyncio.shield(after)
+            for chunk in chunks:
+                await self._send_one(event, chat_id, chunk)
+        finally:
+            self._release(chat_id, after, done)
+
+    async def _send_event(
+        self, event: str, sends: list[tuple[int, asyncio.Future | None, asyncio.Future]], chunks: list[str]
+    ) -> None:
+        """Send formatted event to all chats concurrently (a single chat needs no task per send)."""
+        if len(sends) == 1:
+            chat_id, after, done = sends[0]
+            await self._send_to_chat(event, chat_id, chunks, after, done)
+        else:
+            await asyncio.gather(
+                *(self._send_to_chat(event, chat_id, chunks, after, done) for chat_id, after, done in sends),
+                return_exceptions=True,
+            )
+
+    def _log_throttled(self, event: str, chat_id: int) -> None:
+        """Warn that a chat is over chat_event_rate, at most once per THROTTLE_LOG_INTERVAL per chat."""
+        now = time.monotonic()
+        last = self._throttle_logged.get(chat_id)
+        if last is None or now - last >= self.THROTTLE_LOG_INTERVAL:
+            self._throttle_logged[chat_id] = now
+            logger.warning(
+                f"Chat {chat_id} over chat_event_rate, dropping event {event} "
+                f"(further drops for this chat not logged for {self.THROTTLE_LOG_INTERVAL:.0f}s)"
+            )
+
     async def handle_event(self, event: str, data: dict[str, Any]) -> HookResult:
         """
         Handle Amplifier event and push to Telegram.
 
+        Sends run as background tasks, so the session never waits on Telegram.
+
         Args:
             event: Event name
             data: Event data
@@ -112,44 +249,71 @@ class TelegramBridgeHook:
         Returns:
             HookResult
         """
+        # Unpaired bridge - nothing to filter, format or send
+        if not self.auth_manager.has_users():
+            logger.debug(f"No authorized users, skipping event {event}")
+            return _CONTINUE
+
         # Check if we should observe this event
         if event not in self.events:
-            return HookResult(action="continue")
+            return _CONTINUE
 
         try:
-            # Get authorized chat IDs
-            chat_ids = self.auth_manager.get_chat_ids()
+            # Backpressure - Telegram is not keeping up (checked first so a dropped
+            # event doesn't spend any chat's rate budget)
+            if len(self._pending) >= self.max_pending_sends:
+                logger.warning(f"{len(self._pending)} sends in flight, dropping event {event}")
+                return _CONTINUE
+
+            # Get authorized chat IDs, skipping chats over their event rate
+            chat_ids = []
+            for chat_id in self.auth_manager.target_chat_ids():
+                if self.auth_manager.allow(chat_id):
+                    chat_ids.append(chat_id)
+                else:
+                    self._log_throttled(event, chat_id)
 
             if not chat_ids:
-                logger.debug(f"No authorized users, skipping event {event}")
-                return HookResult(action="continue")
+                return _CONTINUE
 
             # Format message
             message_chunks = self.message_formatter.format_event(event, data)
 
-            # Send to all authorized chats
-            for chat_id in chat_ids:
-                for chunk in message_chunks:
-                    # Non-blocking send with timeout
-                    try:
-                        success = await asyncio.wait_for(
-                            self.telegram_client.async_send_message(chat_id, chunk),
-                            timeout=self.config.get("send_timeout", 5),
-                        )
-
-                        if success:
-                            logger.debug(f"Sent event {event} to chat {chat_id}")
-                        else:
-                            logger.warning(f"Failed to send event {event} to chat {chat_id} (queued for retry)")
+            # Fire and forget - keep a reference so the task isn't garbage collected
+            # Order is fixed here, synchronously, so each chat sees events in arrival order
+            sends = [(chat_id, *self._chain(chat_id)) for chat_id in chat_ids]
+            task = asyncio.create_task(self._send_event(event, sends, message_chunks))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            # A task cancelled before it started never reaches its finally blocks
+            task.add_done_callback(lambda _: [self._release(*send) for send in sends])
 
-                    except TimeoutError:
-                        logger.warning(f"Timeout sending event {event} to chat {chat_id}")
-                    except Exception as e:
-                        logger.error(f"Error sending to chat {chat_id}: {e}")
-
-            return HookResult(action="continue")
+            return _CONTINUE
 
         except Exception as e:
             logger.error(f"Error handling event {event}: {e}")
             # Never block on hook failures
-            return HookResult(action="continue")
+            return _CONTINUE
+
+    async def handle_events(self, batch: list[tuple[str, dict[str, Any]]]) -> list[HookResult]:
+        """
+        Handle a batch of Amplifier events (e.g. during replay).
+
+        Event names are filtered with one set intersection up front, so only
+        observed events go through handle_event.
+
+        Args:
+            batch: (event, data) pairs in delivery order
+
+        Returns:
+            One HookResult per event in batch
+        """
+        if not self.auth_manager.has_users():
+            logger.debug(f"No authorized users, skipping {len(batch)} events")
+            return [_CONTINUE] * len(batch)
+
+        keep = {event for event, _ in batch} & self.events
+        if not keep:
+            return [_CONTINUE] * len(batch)
+
+        return [await self.handle_event(event, data) if event in keep else _CONTINUE for event, data in batch]
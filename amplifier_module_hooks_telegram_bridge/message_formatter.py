@@ -3,8 +3,11 @@ Message formatter for converting Amplifier events to Telegram messages.
 """
 
 import logging
+import sys
 from typing import Any
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,6 +38,10 @@ class MessageFormatter:
         """
         Split long message into chunks at newline boundaries.
 
+        Walks the string once, slicing chunks directly instead of splitting
+        into lines and re-joining them. Lines longer than max_length are split
+        at max_length.
+
         Args:
             text: Message text
             max_length: Maximum chunk length
@@ -46,63 +53,47 @@ class MessageFormatter:
             return [text]
 
         chunks = []
-        lines = text.split("\n")
-        current_chunk = []
-        current_length = 0
-
-        for line in lines:
-            line_length = len(line) + 1  # +1 for newline
-
-            if current_length + line_length > max_length:
-                # Finish current chunk
-                if current_chunk:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = []
-                    current_length = 0
-
-                # Handle line longer than max_length
-                if line_length > max_length:
-                    # Split at max_length boundaries
-                    for i in range(0, len(line), max_length):
-                        chunks.append(line[i : i + max_length])
-                else:
-                    current_chunk.append(line)
-                    current_length = line_length
-            else:
-                current_chunk.append(line)
-                current_length += line_length
-
-        # Add final chunk
-        if current_chunk:
-            chunks.append("\n".join(current_chunk))
+        start = 0
+        length = len(text)
+
+        while start < length:
+            end = min(start + max_length, length)
+            if end < length:
+                # Break at the last newline that fits (a newline right at the limit counts)
+                newline = text.rfind("\n", start, end + 1)
+                if newline > start:
+                    end = newline
+            chunks.append(text[start:end])
+            # Drop the newline we broke on
+            start = end + 1 if end < length and text[end] == "\n" else end
 
         return chunks
 
     @classmethod
     def format_session_start(cls, data: dict[str, Any]) -> list[str]:
         """Format session:start event."""
-        session_id = data.get("session_id", "unknown")
+        session_id = data["session_id"]
         message = f"🚀 *Session Started*\n\nSession ID: `{session_id}`"
         return [message]
 
     @classmethod
     def format_prompt_submit(cls, data: dict[str, Any]) -> list[str]:
         """Format prompt:submit event."""
-        prompt = data.get("prompt", "")
+        prompt = data["prompt"]
         message = f"💬 *Prompt Submitted*\n\n{cls._truncate(prompt, 500)}"
         return cls._chunk_message(message)
 
     @classmethod
     def format_prompt_complete(cls, data: dict[str, Any]) -> list[str]:
         """Format prompt:complete event."""
-        response = data.get("response", "")
+        response = data["response"]
         message = f"✅ *Prompt Complete*\n\n{cls._truncate(response, 1000)}"
         return cls._chunk_message(message)
 
     @classmethod
     def format_provider_request(cls, data: dict[str, Any]) -> list[str]:
         """Format provider:request event."""
-        provider = data.get("provider", "unknown")
+        provider = data["provider"]
         message_count = len(data.get("messages", []))
         message = f"🤖 *Provider Request*\n\nProvider: {provider}\nMessages: {message_count}"
         return [message]
@@ -110,19 +101,22 @@ class MessageFormatter:
     @classmethod
     def format_provider_response(cls, data: dict[str, Any]) -> list[str]:
         """Format provider:response event."""
-        provider = data.get("provider", "unknown")
+        provider = data["provider"]
         tokens = data.get("usage", {})
-        message = f"📊 *Provider Response*\n\nProvider: {provider}\n"
 
         if tokens:
-            message += f"Tokens: input={tokens.get('input_tokens', 0)}, output={tokens.get('output_tokens', 0)}"
+            input_tokens = tokens.get("input_tokens", 0)
+            output_tokens = tokens.get("output_tokens", 0)
+            return [
+                f"📊 *Provider Response*\n\nProvider: {provider}\nTokens: input={input_tokens}, output={output_tokens}"
+            ]
 
-        return [message]
+        return [f"📊 *Provider Response*\n\nProvider: {provider}\n"]
 
     @classmethod
     def format_tool_post(cls, data: dict[str, Any]) -> list[str]:
         """Format tool:post event."""
-        tool_name = data.get("tool_name", "unknown")
+        tool_name = data["tool_name"]
         success = data.get("success", False)
         status = "✅" if success else "❌"
         message = f"{status} *Tool Executed*\n\nTool: `{tool_name}`\nSuccess: {success}"
@@ -130,10 +124,9 @@ class MessageFormatter:
 
     @classmethod
     def format_generic_event(cls, event: str, data: dict[str, Any]) -> list[str]:
-        """Format any event as JSON (fallback)."""
-        import json
-
-        message = f"📝 *Event: {event}*\n\n```json\n{json.dumps(data, indent=2)[:1000]}\n```"
+        """Format any event as JSON (fallback). Values orjson can't serialize are shown via str()."""
+        payload = orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+        message = f"📝 *Event: {event}*\n\n```json\n{payload[:1000]}\n```"
         return cls._chunk_message(message)
 
     @classmethod
@@ -141,6 +134,10 @@ class MessageFormatter:
         """
         Format event based on type.
 
+        Event-specific formatters index the keys they need directly; a payload
+        they can't format falls back to the generic JSON format, and a payload
+        that can't be formatted at all gets a short error message.
+
         Args:
             event: Event name
             data: Event data
@@ -148,22 +145,33 @@ class MessageFormatter:
         Returns:
             List of message chunks
         """
-        # Map events to formatters
-        formatters = {
-            "session:start": cls.format_session_start,
-            "prompt:submit": cls.format_prompt_submit,
-            "prompt:complete": cls.format_prompt_complete,
-            "provider:request": cls.format_provider_request,
-            "provider:response": cls.format_provider_response,
-            "tool:post": cls.format_tool_post,
-        }
-
-        formatter = formatters.get(event)
+        formatter = _FORMATTERS.get(event)
 
-        try:
-            if formatter:
+        if formatter is not None and isinstance(data, dict):
+            try:
                 return formatter(data)
+            except KeyError as e:
+                logger.debug(f"Event {event} has no {e}, formatting as JSON")
+            except (TypeError, ValueError) as e:
+                logger.error(f"Error formatting event {event}: {e}, formatting as JSON")
+
+        try:
             return cls.format_generic_event(event, data)
-        except Exception as e:
+        except (TypeError, ValueError) as e:
             logger.error(f"Error formatting event {event}: {e}")
             return [f"❌ Error formatting event: {event}"]
+
+
+# Map events to formatters (built once, not per event). Keys are interned like
+# TelegramBridgeHook.events, so lookups for registered events hit on identity.
+_FORMATTERS = {
+    sys.intern(event): formatter
+    for event, formatter in {
+        "session:start": MessageFormatter.format_session_start,
+        "prompt:submit": MessageFormatter.format_prompt_submit,
+        "prompt:complete": MessageFormatter.format_prompt_complete,
+        "provider:request": MessageFormatter.format_provider_request,
+        "provider:response": MessageFormatter.format_provider_response,
+        "tool:post": MessageFormatter.format_tool_post,
+    }.items()
+}
@@ -4,25 +4,72 @@ Telegram Bot API client with resilience and retry logic.
 
 import asyncio
 import logging
+import threading
 import time
+import weakref
 from collections import deque
-from dataclasses import dataclass
-from datetime import datetime
-from datetime import timedelta
+from collections.abc import Callable
 
 import requests
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive HTTP session shared by every TelegramClient in the process, created
+# on first send and closed once the last client using it is closed. Sync sends
+# may come from any thread, so creation and closing are guarded by _SESSION_LOCK.
+_SESSION: requests.Session | None = None
+_SESSION_CLIENTS: "weakref.WeakSet[TelegramClient]" = weakref.WeakSet()
+_SESSION_LOCK = threading.Lock()
 
-@dataclass
-class QueuedMessage:
-    """Queued message for retry."""
 
-    chat_id: int
-    text: str
-    queued_at: datetime
-    retry_count: int = 0
+class TokenBucket:
+    """
+    Token bucket for pacing async sends.
+
+    Callers reserve a token up front and sleep off any deficit, so waiters are
+    served in arrival order without a lock (all access is on the event loop).
+
+    State is kept as integer nanoseconds of credit against time.monotonic_ns():
+    a token costs 1/rate seconds of credit, so refill is just the elapsed time.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize token bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._cost_ns = round(1_000_000_000 / rate)
+        self._capacity_ns = round(capacity * self._cost_ns)
+        self.credit_ns = self._capacity_ns
+        self.updated_ns = time.monotonic_ns()
+
+    async def acquire(self) -> None:
+        """Take one token, waiting until it is available (cancelling the wait returns the token)."""
+        now = time.monotonic_ns()
+        self.credit_ns = min(self._capacity_ns, self.credit_ns + now - self.updated_ns)
+        self.updated_ns = now
+
+        self.credit_ns -= self._cost_ns
+        if self.credit_ns < 0:
+            try:
+                await asyncio.sleep(-self.credit_ns / 1_000_000_000)
+            except asyncio.CancelledError:
+                self.refund()
+                raise
+
+    def wait_time(self) -> float:
+        """Seconds acquire() would currently wait for a token."""
+        credit = min(self._capacity_ns, self.credit_ns + time.monotonic_ns() - self.updated_ns)
+        return max(0, self._cost_ns - credit) / 1_000_000_000
+
+    def refund(self) -> None:
+        """Return a token taken by acquire() that was not used."""
+        self.credit_ns = min(self._capacity_ns, self.credit_ns + self._cost_ns)
 
 
 class TelegramClient:
@@ -35,6 +82,9 @@ class TelegramClient:
         max_retries: int = 5,
         max_queue_size: int = 100,
         queue_ttl_hours: int = 1,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
     ):
         """
         Initialize Telegram client.
@@ -45,122 +95,309 @@ class TelegramClient:
             max_retries: Maximum retry attempts
             max_queue_size: Maximum queued messages
             queue_ttl_hours: Hours before queued messages expire
+            global_rate: Messages per second across all chats
+            chat_rate: Messages per second per chat
+            chat_burst: Messages a chat may send back-to-back before pacing applies
         """
         self.bot_token = bot_token
+        self._send_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
         self.send_timeout = send_timeout
         self.max_retries = max_retries
         self.max_queue_size = max_queue_size
-        self.queue_ttl = timedelta(hours=queue_ttl_hours)
+        self.queue_ttl = queue_ttl_hours * 3600.0
 
-        # Failed message queue
-        self.message_queue: deque[QueuedMessage] = deque(maxlen=max_queue_size)
+        # Failed message queue, one deque per field (always pushed/popped together).
+        # Timestamps are time.monotonic() so TTL checks are plain float compares.
+        self._q_chat: deque[int] = deque(maxlen=max_queue_size)
+        self._q_text: deque[str] = deque(maxlen=max_queue_size)
+        self._q_ts: deque[float] = deque(maxlen=max_queue_size)
+        self._q_retry: deque[int] = deque(maxlen=max_queue_size)
 
         # Retry backoff (exponential: 1s, 2s, 4s, 8s, max 60s)
         self.base_backoff = 1.0
         self.max_backoff = 60.0
 
+        # Outgoing rate limits (Bot API allows ~30 msg/s overall, ~1 msg/s per chat)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global_bucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+
     @property
     def base_url(self) -> str:
         """Get base API URL."""
         return f"https://api.telegram.org/bot{self.bot_token}"
 
-    def send_message(self, chat_id: int, text: str, parse_mode: str = "Markdown") -> bool:
+    @property
+    def session(self) -> requests.Session:
+        """Get the shared HTTP session, reusing pooled connections across sends and clients."""
+        global _SESSION
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = requests.Session()
+            _SESSION_CLIENTS.add(self)
+            return _SESSION
+
+    def close(self) -> None:
         """
-        Send message to Telegram chat (synchronous).
+        Release the shared HTTP session, closing its pooled connections if no other client uses it.
+
+        Requests already in flight keep the session they were started with and
+        finish normally; their connections are closed as they are released.
+        """
+        global _SESSION
+        with _SESSION_LOCK:
+            _SESSION_CLIENTS.discard(self)
+            if _SESSION is None or _SESSION_CLIENTS:
+                return
+            session, _SESSION = _SESSION, None
+        session.close()
+
+    def _post(self, session: requests.Session, chat_id: int, text: str, parse_mode: str) -> requests.Response | None:
+        """
+        POST sendMessage request.
 
         Args:
+            session: HTTP session, fetched by the caller (not from the executor thread)
             chat_id: Telegram chat ID
             text: Message text
             parse_mode: Telegram parse mode
 
         Returns:
-            True if successful, False otherwise
+            Response, or None if the request failed (already logged)
         """
-        url = f"{self.base_url}/sendMessage"
         payload = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
 
         try:
-            response = requests.post(url, json=payload, timeout=self.send_timeout)
-
-            if response.status_code == 200:
-                logger.debug(f"Sent message to chat {chat_id}")
-                return True
-            logger.warning(f"Failed to send message: {response.status_code} - {response.text}")
-            # Queue for retry
-            self._queue_message(chat_id, text)
-            return False
+            return session.post(self._send_url, json=payload, timeout=self.send_timeout)
 
         except requests.Timeout:
             logger.warning(f"Timeout sending message to chat {chat_id}")
-            self._queue_message(chat_id, text)
-            return False
+            return None
 
         except Exception as e:
             logger.error(f"Error sending message: {e}")
-            self._queue_message(chat_id, text)
-            return False
+            return None
+
+    def _check_response(self, chat_id: int, text: str, response: requests.Response | None) -> bool:
+        """
+        Check send result, queueing the message for retry on failure.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if response is not None and response.status_code == 200:
+            logger.debug(f"Sent message to chat {chat_id}")
+            return True
+
+        if response is not None:
+            logger.warning(f"Failed to send message: {response.status_code} - {response.text}")
+        # Queue for retry
+        self._queue_message(chat_id, text)
+        return False
+
+    @staticmethod
+    def _parse_retry_after(response: requests.Response) -> float:
+        """Get wait time from a 429 response (parameters.retry_after, then Retry-After header)."""
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except Exception:
+            return float(response.headers.get("Retry-After", 1))
+
+    def send_message(self, chat_id: int, text: str, parse_mode: str = "Markdown") -> bool:
+        """
+        Send message to Telegram chat (synchronous).
+
+        Args:
+            chat_id: Telegram chat ID
+            text: Message text
+            parse_mode: Telegram parse mode
+
+        Returns:
+            True if successful, False otherwise
+        """
+        return self._check_response(chat_id, text, self._post(self.session, chat_id, text, parse_mode))
+
+    def _queue_message(self, chat_id: int, text: str, queued_at: float | None = None, retry_count: int = 0) -> None:
+        """
+        Queue failed message for retry.
 
-    def _queue_message(self, chat_id: int, text: str) -> None:
-        """Queue failed message for retry."""
-        if len(self.message_queue) >= self.max_queue_size:
+        Args:
+            chat_id: Telegram chat ID
+            text: Message text
+            queued_at: Original time.monotonic() queue time (defaults to now)
+            retry_count: Retries already attempted
+        """
+        if len(self._q_chat) >= self.max_queue_size:
             logger.warning(f"Message queue full ({self.max_queue_size}), dropping oldest message")
 
-        queued = QueuedMessage(chat_id=chat_id, text=text, queued_at=datetime.now())
-        self.message_queue.append(queued)
-        logger.info(f"Queued message for retry (queue size: {len(self.message_queue)})")
+        self._q_chat.append(chat_id)
+        self._q_text.append(text)
+        self._q_ts.append(time.monotonic() if queued_at is None else queued_at)
+        self._q_retry.append(retry_count)
+        logger.info(f"Queued message for retry (queue size: {len(self._q_chat)})")
 
-    def retry_queue(self) -> int:
+    async def retry_queue(self) -> int:
         """
         Retry queued messages with exponential backoff.
 
+        Each message waits out its own backoff concurrently via asyncio.sleep, so a
+        batch takes as long as its longest backoff rather than the sum, and no
+        executor thread is held while waiting.
+
         Returns:
             Number of successfully sent messages
         """
-        if not self.message_queue:
+        if not self._q_chat:
             return 0
 
-        sent_count = 0
-        failed_messages = []
+        retries = []
+        now = time.monotonic()
 
-        # Process queue
-        while self.message_queue:
-            msg = self.message_queue.popleft()
+        # Drain queue - messages that fail again are re-queued for the next batch
+        while self._q_chat:
+            chat_id = self._q_chat.popleft()
+            text = self._q_text.popleft()
+            queued_at = self._q_ts.popleft()
+            retry_count = self._q_retry.popleft()
 
             # Check TTL
-            if datetime.now() - msg.queued_at > self.queue_ttl:
-                logger.warning(f"Message expired (queued {msg.queued_at}), dropping")
+            if now - queued_at > self.queue_ttl:
+                logger.warning(f"Message expired (queued {now - queued_at:.0f}s ago), dropping")
                 continue
 
             # Check retry limit
-            if msg.retry_count >= self.max_retries:
+            if retry_count >= self.max_retries:
                 logger.warning(f"Message exceeded max retries ({self.max_retries}), dropping")
                 continue
 
-            # Calculate backoff
-            backoff = min(self.base_backoff * (2**msg.retry_count), self.max_backoff)
+            retries.append(self._retry_message(chat_id, text, queued_at, retry_count))
 
-            logger.info(f"Retrying message (attempt {msg.retry_count + 1}, backoff {backoff}s)")
-            time.sleep(backoff)
+        results = await asyncio.gather(*retries)
+        sent_count = sum(results)
 
-            # Retry send
-            success = self.send_message(msg.chat_id, msg.text)
+        logger.info(f"Retry batch complete: {sent_count} sent, {len(self._q_chat)} remain queued")
+        return sent_count
 
-            if success:
-                sent_count += 1
-            else:
-                # Re-queue with incremented retry count
-                msg.retry_count += 1
-                failed_messages.append(msg)
+    async def _retry_message(self, chat_id: int, text: str, queued_at: float, retry_count: int) -> bool:
+        """
+        Resend one queued message after its backoff, re-queueing it on failure.
 
-        # Re-queue failed messages
-        self.message_queue.extend(failed_messages)
+        Returns:
+            True if sent, False otherwise
+        """
+        backoff = min(self.base_backoff * (2**retry_count), self.max_backoff)
+        logger.info(f"Retrying message (attempt {retry_count + 1}, backoff {backoff}s)")
 
-        logger.info(f"Retry batch complete: {sent_count} sent, {len(self.message_queue)} remain queued")
-        return sent_count
+        def keep() -> None:
+            # Retry loop stopped before the message went out - keep it for next time
+            self._queue_message(chat_id, text, queued_at, retry_count)
+
+        try:
+            await asyncio.sleep(backoff)
+        except asyncio.CancelledError:
+            keep()
+            raise
+
+        response = await self._deliver(chat_id, text, "Markdown", keep)
+
+        if response is not None and response.status_code == 200:
+            logger.debug(f"Sent queued message to chat {chat_id}")
+            return True
+
+        if response is not None:
+            logger.warning(f"Failed to resend message: {response.status_code} - {response.text}")
+        # Re-queue with incremented retry count
+        self._queue_message(chat_id, text, queued_at, retry_count + 1)
+        return False
+
+    async def _deliver(
+        self, chat_id: int, text: str, parse_mode: str, keep: Callable[[], None]
+    ) -> requests.Response | None:
+        """
+        Send paced by the global and per-chat rate limits, retrying once on HTTP 429.
+
+        The request itself runs in an executor and is bounded by send_timeout; the
+        pacing wait is not. On 429 the send is retried after Telegram's retry_after
+        instead of waiting for the retry loop.
+
+        If cancelled, keep() is called once it is known the message did not go out:
+        straight away while still pacing, or when an in-flight request fails. A
+        request that may already have been delivered is never kept, so it can't be
+        sent twice.
+
+        Returns:
+            Final response, or None if the request failed
+        """
+        chat_bucket = self._chat_buckets.get(chat_id)
+        if chat_bucket is None:
+            chat_bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+
+        try:
+            await self._global_bucket.acquire()
+            try:
+                await chat_bucket.acquire()
+            except asyncio.CancelledError:
+                self._global_bucket.refund()
+                raise
+        except asyncio.CancelledError:
+            keep()
+            raise
+
+        response = await self._post_in_executor(chat_id, text, parse_mode, keep)
+
+        if response is not None and response.status_code == 429:
+            retry_after = self._parse_retry_after(response)
+            logger.warning(f"Rate limited by Telegram, retrying chat {chat_id} in {retry_after}s")
+            try:
+                await asyncio.sleep(retry_after)
+            except asyncio.CancelledError:
+                # Telegram rejected the first attempt, so nothing was delivered
+                keep()
+                raise
+            response = await self._post_in_executor(chat_id, text, parse_mode, keep)
+
+        return response
+
+    async def _post_in_executor(
+        self, chat_id: int, text: str, parse_mode: str, keep: Callable[[], None]
+    ) -> requests.Response | None:
+        """
+        Run _post in an executor.
+
+        Cancelling the caller doesn't stop a request already on the wire, so the
+        executor future is shielded and its result decides whether keep() runs.
+        The session is fetched here on the loop thread, not in the executor.
+        """
+        future = asyncio.get_running_loop().run_in_executor(None, self._post, self.session, chat_id, text, parse_mode)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+
+            def keep_if_failed(done: asyncio.Future) -> None:
+                response = None if done.cancelled() else done.result()
+                if response is None or response.status_code != 200:
+                    keep()
+
+            future.add_done_callback(keep_if_failed)
+            raise
+
+    def pacing_delay(self, chat_id: int) -> float:
+        """
+        Get how long a send to a chat would currently wait on the rate limits.
+
+        Returns:
+            Seconds until both the global and the chat's token are available
+        """
+        chat_bucket = self._chat_buckets.get(chat_id)
+        return self._global_bucket.wait_time() + (chat_bucket.wait_time() if chat_bucket else 0.0)
 
     async def async_send_message(self, chat_id: int, text: str, parse_mode: str = "Markdown") -> bool:
         """
-        Send message asynchronously (runs sync version in executor).
+        Send message asynchronously, paced by the global and per-chat rate limits.
+
+        Cancelling waits for the rate limits without spending the token; the message
+        is queued for retry unless it may already have been delivered.
 
         Args:
             chat_id: Telegram chat ID
@@ -170,8 +407,8 @@ class TelegramClient:
         Returns:
             True if successful, False otherwise
         """
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.send_message, chat_id, text, parse_mode)
+        response = await self._deliver(chat_id, text, parse_mode, lambda: self._queue_message(chat_id, text))
+        return self._check_response(chat_id, text, response)
 
     def get_queue_status(self) -> dict:
         """
@@ -181,9 +418,7 @@ class TelegramClient:
             Dictionary with queue metrics
         """
         return {
-            "queued_messages": len(self.message_queue),
+            "queued_messages": len(self._q_chat),
             "max_queue_size": self.max_queue_size,
-            "oldest_message_age": (datetime.now() - self.message_queue[0].queued_at).total_seconds()
-            if self.message_queue
-            else 0,
+            "oldest_message_age": time.monotonic() - self._q_ts[0] if self._q_ts else 0,
         }
@@ -0,0 +1,15 @@
+"""Shared pytest configuration."""
+
+import pytest
+
+try:
+    import uvloop
+except ImportError:  # Optional - not available on Windows
+    uvloop = None
+
+if uvloop is not None:
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_asyncio_loop_factories(config, item):
+        """Run async tests on uvloop when it is installed."""
+        return {"uvloop": uvloop.new_event_loop}
@@ -0,0 +1,259 @@
+"""Tests for AuthManager."""
+
+import os
+
+import orjson
+import pytest
+from amplifier_module_hooks_telegram_bridge.auth_manager import AuthManager
+from amplifier_module_hooks_telegram_bridge.auth_manager import _load_snapshot
+
+
+@pytest.fixture
+def pairing_file(tmp_path):
+    """Create temporary pairing file with one authorized user."""
+    pairing_file = tmp_path / "pairing.json"
+    pairing_data = {
+        "version": "1.0",
+        "authorized_users": [
+            {"user_id": 123456, "chat_id": 654321, "username": "testuser", "paired_at": "2025-01-01T00:00:00Z"}
+        ],
+        "rate_limits": {},
+    }
+    pairing_file.write_bytes(orjson.dumps(pairing_data, option=orjson.OPT_INDENT_2))
+    return pairing_file
+
+
+def test_reads_authorized_users(pairing_file):
+    """Test authorized user and chat IDs are read from pairing file."""
+    auth = AuthManager(pairing_file)
+
+    assert auth.get_authorized_users() == {123456}
+    assert auth.get_chat_ids() == {654321}
+    assert auth.is_authorized(123456)
+    assert not auth.is_authorized(999)
+
+
+def test_snapshot_parse_shared_across_instances(pairing_file):
+    """Test a second AuthManager on an unchanged file reuses the parsed snapshot."""
+    AuthManager(pairing_file).get_chat_ids()
+    hits = _load_snapshot.cache_info().hits
+
+    assert AuthManager(pairing_file).get_chat_ids() == {654321}
+    assert _load_snapshot.cache_info().hits == hits + 1
+
+
+def test_cache_invalidated_on_external_edit(pairing_file):
+    """Test cached pairing data is reloaded when the file changes on disk."""
+    auth = AuthManager(pairing_file, cache_ttl=0)
+    assert auth.get_chat_ids() == {654321}
+
+    pairing_file.write_bytes(orjson.dumps({"version": "1.0", "authorized_users": [], "rate_limits": {}}))
+    # Force a distinct mtime regardless of filesystem timestamp resolution
+    stat = os.stat(pairing_file)
+    os.utime(pairing_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert auth.get_chat_ids() == set()
+
+
+def test_cache_ttl_skips_recheck(pairing_file):
+    """Test external edits are not picked up until the TTL expires."""
+    auth = AuthManager(pairing_file, cache_ttl=60)
+    assert auth.get_chat_ids() == {654321}
+
+    pairing_file.write_bytes(orjson.dumps({"version": "1.0", "authorized_users": [], "rate_limits": {}}))
+    stat = os.stat(pairing_file)
+    os.utime(pairing_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert auth.get_chat_ids() == {654321}
+
+    auth._checked_at -= 60
+    assert auth.get_chat_ids() == set()
+
+
+def test_add_and_remove_user(pairing_file):
+    """Test writes are visible to subsequent reads."""
+    auth = AuthManager(pairing_file)
+
+    assert auth.add_user(42, 4242, "alice")
+    assert auth.get_chat_ids() == {654321, 4242}
+
+    assert auth.remove_user(42)
+    assert auth.get_chat_ids() == {654321}
+    assert not auth.remove_user(42)
+
+
+def test_rate_limit_blocks_after_max_attempts(pairing_file):
+    """Test user is blocked after reaching max failed attempts."""
+    auth = AuthManager(pairing_file)
+
+    for _ in range(2):
+        assert not auth.check_rate_limit(777)
+        auth.record_failed_attempt(777, max_attempts=2)
+
+    assert auth.check_rate_limit(777)
+
+
+def test_pairing_changes_rewrite_snapshot(pairing_file):
+    """Test adds and removes land in pairing.json itself, leaving the log alone."""
+    auth = AuthManager(pairing_file)
+
+    auth.add_user(42, 4242, "alice")
+    auth.remove_user(123456)
+
+    snapshot_user_ids = {user["user_id"] for user in orjson.loads(pairing_file.read_bytes())["authorized_users"]}
+    assert snapshot_user_ids == {42}
+    assert auth.log_file.read_bytes() == b""
+    assert AuthManager(pairing_file).get_chat_ids() == {4242}
+
+
+def test_failed_attempts_append_to_log(pairing_file):
+    """Test failed attempts go to the JSONL log and replay on a fresh instance."""
+    snapshot = pairing_file.read_bytes()
+    auth = AuthManager(pairing_file)
+
+    auth.record_failed_attempt(777, max_attempts=2)
+    auth.record_failed_attempt(777, max_attempts=2)
+
+    # Snapshot untouched, a header naming it plus one log record per attempt
+    assert pairing_file.read_bytes() == snapshot
+    assert len(auth.log_file.read_text().splitlines()) == 3
+    assert AuthManager(pairing_file).check_rate_limit(777)
+
+
+def _tool_module_add(pairing_file, user_id):
+    """Add a user the way the tool module does: read pairing.json, rewrite it in full."""
+    pairing_data = orjson.loads(pairing_file.read_bytes())
+    pairing_data["authorized_users"].append(
+        {"user_id": user_id, "chat_id": user_id * 10, "username": None, "paired_at": "2025-01-01T00:00:00Z"}
+    )
+    pairing_file.write_bytes(orjson.dumps(pairing_data))
+    stat = os.stat(pairing_file)
+    os.utime(pairing_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_pairing_shared_with_tool_module(pairing_file):
+    """Test pairings and revocations survive the tool module rewriting pairing.json."""
+    auth = AuthManager(pairing_file, cache_ttl=0)
+    auth.add_user(1, 10)
+    auth.add_user(2, 20)
+
+    _tool_module_add(pairing_file, 3)
+    assert auth.get_authorized_users() == {123456, 1, 2, 3}
+
+    # The tool module sees the revocation, so its next write doesn't undo it
+    auth.remove_user(3)
+    _tool_module_add(pairing_file, 4)
+    assert auth.get_authorized_users() == {123456, 1, 2, 4}
+    assert AuthManager(pairing_file).get_authorized_users() == {123456, 1, 2, 4}
+
+
+def test_concurrent_appends_are_replayed(pairing_file):
+    """Test a manager appending after another one's write still sees that write."""
+    first = AuthManager(pairing_file)
+    second = AuthManager(pairing_file)
+    first.get_chat_ids()
+    second.get_chat_ids()
+
+    first.record_failed_attempt(777, max_attempts=3)
+    # second is still within its cache TTL, so it hasn't seen that attempt yet
+    second.record_failed_attempt(777, max_attempts=3)
+    second.record_failed_attempt(777, max_attempts=3)
+
+    assert second.check_rate_limit(777)
+    assert AuthManager(pairing_file).check_rate_limit(777)
+
+
+def test_log_compacts_into_snapshot(pairing_file):
+    """Test log is folded into pairing.json once it reaches the threshold."""
+    auth = AuthManager(pairing_file, compact_threshold=3)
+
+    for user_id in (1, 2, 3):
+        auth.record_failed_attempt(user_id)
+
+    assert auth.log_file.read_bytes() == b""
+    snapshot_rate_limits = orjson.loads(pairing_file.read_bytes())["rate_limits"]
+    assert {key: value["failed_attempts"] for key, value in snapshot_rate_limits.items()} == {"1": 1, "2": 1, "3": 1}
+
+
+def test_interrupted_compaction_does_not_replay_log(pairing_file):
+    """Test a log left behind by a crash mid-compaction isn't counted twice."""
+    auth = AuthManager(pairing_file)
+    auth.record_failed_attempt(777, max_attempts=3)
+    auth.record_failed_attempt(777, max_attempts=3)
+    log = auth.log_file.read_bytes()
+
+    # Crash after the snapshot was replaced but before the log was truncated
+    auth.compact()
+    auth.log_file.write_bytes(log)
+
+    # Two attempts so far - replaying the log over the snapshot would make this the fifth
+    fresh = AuthManager(pairing_file)
+    fresh.record_failed_attempt(777, max_attempts=4)
+    assert not fresh.check_rate_limit(777)
+
+
+def test_has_users_tracks_pairings(tmp_path):
+    """Test has_users flips as users are added and removed."""
+    auth = AuthManager(tmp_path / "pairing.json")
+    assert not auth.has_users()
+
+    auth.add_user(42, 4242)
+    assert auth.has_users()
+
+    auth.remove_user(42)
+    assert not auth.has_users()
+
+
+def test_expired_block_is_cleared(pairing_file):
+    """Test a block whose deadline has passed is lifted and reset."""
+    pairing_data = orjson.loads(pairing_file.read_bytes())
+    pairing_data["rate_limits"]["777"] = {"failed_attempts": 5, "blocked_until": "2000-01-01T00:00:00"}
+    pairing_file.write_bytes(orjson.dumps(pairing_data))
+    auth = AuthManager(pairing_file)
+
+    assert not auth.check_rate_limit(777)
+
+    # Attempts were reset too - one more failure doesn't re-block
+    fresh = AuthManager(pairing_file)
+    fresh.record_failed_attempt(777, max_attempts=2)
+    assert not fresh.check_rate_limit(777)
+
+
+def test_bad_block_entry_only_affects_its_user(pairing_file):
+    """Test an unparseable or timezone-aware blocked_until doesn't break the load."""
+    pairing_data = orjson.loads(pairing_file.read_bytes())
+    pairing_data["rate_limits"] = {
+        "777": {"failed_attempts": 5, "blocked_until": "not a date"},
+        "888": {"failed_attempts": 5, "blocked_until": "2999-01-01T00:00:00+00:00"},
+    }
+    pairing_file.write_bytes(orjson.dumps(pairing_data))
+    auth = AuthManager(pairing_file)
+
+    assert auth.has_users()
+    assert auth.target_chat_ids() == (654321,)
+    assert not auth.check_rate_limit(777)
+    assert auth.check_rate_limit(888)
+
+
+def test_target_chat_ids_dedupes_shared_chats(pairing_file):
+    """Test users sharing a chat produce one fan-out target, in pairing order."""
+    auth = AuthManager(pairing_file)
+    auth.add_user(1, 111)
+    auth.add_user(2, 654321)
+
+    assert auth.target_chat_ids() == (654321, 111)
+
+
+def test_allow_throttles_per_chat(pairing_file):
+    """Test each chat gets its burst, then is refused until tokens refill."""
+    auth = AuthManager(pairing_file, event_rate=0.001, event_burst=2)
+
+    assert auth.allow(1)
+    assert auth.allow(1)
+    assert not auth.allow(1)
+
+    # Other chats have their own bucket
+    assert auth.allow(2)
+
+    auth._buckets[1][1] -= 1000 * 1_000_000_000
+    assert auth.allow(1)
@@ -1,17 +1,22 @@
 """Tests for TelegramBridgeHook."""
 
 import asyncio
-import json
 from unittest.mock import AsyncMock
+from unittest.mock import Mock
 
+import orjson
 import pytest
 from amplifier_module_hooks_telegram_bridge.hook import TelegramBridgeHook
 
 
-@pytest.fixture
-def temp_pairing_file(tmp_path):
-    """Create temporary pairing file."""
-    pairing_file = tmp_path / "pairing.json"
+async def _always_true(*_, **__) -> bool:
+    """Stand-in sender for tests that don't inspect calls (cheaper than AsyncMock)."""
+    return True
+
+
+def _write_pairing_file(directory):
+    """Write a pairing file with one authorized user into directory."""
+    pairing_file = directory / "pairing.json"
     pairing_data = {
         "version": "1.0",
         "authorized_users": [
@@ -19,42 +24,57 @@ def temp_pairing_file(tmp_path):
         ],
         "rate_limits": {},
     }
-    pairing_file.write_text(json.dumps(pairing_data, indent=2))
+    pairing_file.write_bytes(orjson.dumps(pairing_data, option=orjson.OPT_INDENT_2))
     return pairing_file
 
 
-@pytest.fixture
-def hook_config(temp_pairing_file):
-    """Hook configuration."""
+def _config(pairing_file):
+    """Build hook configuration for pairing_file."""
     return {
         "bot_token": "test_token_123",
-        "pairing_file": str(temp_pairing_file),
+        "pairing_file": str(pairing_file),
         "send_timeout": 5,
         "reconnect_interval": 60,
     }
 
 
+@pytest.fixture
+def temp_pairing_file(tmp_path):
+    """Create temporary pairing file."""
+    return _write_pairing_file(tmp_path)
+
+
+@pytest.fixture
+def hook_config(temp_pairing_file):
+    """Hook configuration."""
+    return _config(temp_pairing_file)
+
+
+@pytest.fixture(scope="module")
+def shared_hook(tmp_path_factory):
+    """Hook shared by tests that neither edit the pairing file nor change config."""
+    return TelegramBridgeHook(_config(_write_pairing_file(tmp_path_factory.mktemp("shared"))))
+
+
 @pytest.mark.asyncio
-async def test_hook_initialization(hook_config):
+async def test_hook_initialization(shared_hook):
     """Test hook initializes correctly."""
-    hook = TelegramBridgeHook(hook_config)
-
-    assert hook.telegram_client is not None
-    assert hook.auth_manager is not None
-    assert hook.message_formatter is not None
-    assert len(hook.events) > 0
+    assert shared_hook.telegram_client is not None
+    assert shared_hook.auth_manager is not None
+    assert shared_hook.message_formatter is not None
+    assert len(shared_hook.events) > 0
 
 
 @pytest.mark.asyncio
-async def test_hook_handles_event(hook_config):
+async def test_hook_handles_event(shared_hook):
     """Test hook handles event and sends to Telegram."""
-    hook = TelegramBridgeHook(hook_config)
-
     # Mock telegram client
-    hook.telegram_client.async_send_message = AsyncMock(return_value=True)
+    shared_hook.telegram_client.async_send_message = _always_true
 
     # Handle event
-    result = await hook.handle_event("session:start", {"session_id": "test-123"})
+    result = await shared_hook.handle_event("session:start", {"session_id": "test-123"})
+    # Background send must finish on this test's event loop
+    await shared_hook.flush()
 
     assert result.action == "continue"
 
@@ -68,35 +88,46 @@ async def test_hook_filters_events(hook_config):
     # Mock telegram client
     hook.telegram_client.async_send_message = AsyncMock(return_value=True)
 
+    assert hook.events == frozenset({"session:start"})
+
     # Handle observed event
     result = await hook.handle_event("session:start", {"session_id": "test-123"})
+    await hook.flush()
     assert result.action == "continue"
+    assert hook.telegram_client.async_send_message.call_count == 1
 
     # Handle unobserved event (should skip)
     result = await hook.handle_event("prompt:submit", {"prompt": "test"})
+    await hook.flush()
     assert result.action == "continue"
+    assert hook.telegram_client.async_send_message.call_count == 1
 
 
 @pytest.mark.asyncio
 async def test_hook_no_authorized_users(hook_config, temp_pairing_file):
     """Test hook skips when no authorized users."""
     # Empty pairing file
-    temp_pairing_file.write_text(json.dumps({"version": "1.0", "authorized_users": [], "rate_limits": {}}, indent=2))
+    pairing_data = {"version": "1.0", "authorized_users": [], "rate_limits": {}}
+    temp_pairing_file.write_bytes(orjson.dumps(pairing_data, option=orjson.OPT_INDENT_2))
 
     hook = TelegramBridgeHook(hook_config)
 
     # Mock telegram client (should NOT be called)
     hook.telegram_client.async_send_message = AsyncMock(return_value=True)
 
+    hook.message_formatter.format_event = Mock(wraps=hook.message_formatter.format_event)
+
     await hook.handle_event("session:start", {"session_id": "test-123"})
 
-    # Should not call telegram client
+    # Should neither format nor call telegram client
+    hook.message_formatter.format_event.assert_not_called()
     hook.telegram_client.async_send_message.assert_not_called()
 
 
 @pytest.mark.asyncio
 async def test_hook_timeout_handling(hook_config):
     """Test hook handles send timeout gracefully."""
+    hook_config["send_timeout"] = 0.2
     hook = TelegramBridgeHook(hook_config)
 
     # Mock timeout
@@ -106,6 +137,213 @@ async def test_hook_timeout_handling(hook_config):
 
     hook.telegram_client.async_send_message = timeout_send
 
-    # Should not raise, should continue
+    # Should not raise, should continue without waiting on the send
+    loop = asyncio.get_running_loop()
+    started = loop.time()
     result = await hook.handle_event("session:start", {"session_id": "test-123"})
     assert result.action == "continue"
+    assert loop.time() - started < 1
+
+    # The hung send is abandoned at send_timeout without anyone flushing
+    await asyncio.sleep(0.4)
+    assert not hook._pending
+
+
+@pytest.mark.asyncio
+async def test_hook_fans_out_concurrently(hook_config, temp_pairing_file):
+    """Test chats are sent to concurrently while chunks stay ordered per chat."""
+    pairing_data = orjson.loads(temp_pairing_file.read_bytes())
+    pairing_data["authorized_users"].append(
+        {"user_id": 654321, "chat_id": 654321, "username": "other", "paired_at": "2025-01-01T00:00:00Z"}
+    )
+    temp_pairing_file.write_bytes(orjson.dumps(pairing_data, option=orjson.OPT_INDENT_2))
+
+    hook = TelegramBridgeHook(hook_config)
+    hook.message_formatter.format_event = lambda event, data: ["part 1", "part 2"]
+
+    sent = []
+
+    async def slow_send(chat_id, text) -> bool:
+        await asyncio.sleep(0.2)
+        sent.append((chat_id, text))
+        return True
+
+    hook.telegram_client.async_send_message = slow_send
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await hook.handle_event("session:start", {"session_id": "test-123"})
+    await hook.flush()
+
+    # Two chats x two chunks: ~0.4s concurrent vs ~0.8s serial
+    assert loop.time() - started < 0.7
+    for chat_id in (123456, 654321):
+        assert [text for cid, text in sent if cid == chat_id] == ["part 1", "part 2"]
+
+
+@pytest.mark.asyncio
+async def test_hook_formats_once_per_event(hook_config, temp_pairing_file):
+    """Test an event is formatted once no matter how many chats it fans out to."""
+    pairing_data = orjson.loads(temp_pairing_file.read_bytes())
+    for user_id in (222222, 333333):
+        pairing_data["authorized_users"].append(
+            {"user_id": user_id, "chat_id": user_id, "username": None, "paired_at": "2025-01-01T00:00:00Z"}
+        )
+    temp_pairing_file.write_bytes(orjson.dumps(pairing_data, option=orjson.OPT_INDENT_2))
+
+    hook_config["events"] = ["custom:event"]
+    hook = TelegramBridgeHook(hook_config)
+    hook.telegram_client.async_send_message = AsyncMock(return_value=True)
+    hook.message_formatter.format_event = Mock(wraps=hook.message_formatter.format_event)
+
+    await hook.handle_event("custom:event", {"key": "value"})
+    await hook.flush()
+
+    hook.message_formatter.format_event.assert_called_once()
+    assert hook.telegram_client.async_send_message.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_hook_drops_events_when_sends_back_up(hook_config):
+    """Test new events are dropped once max_pending_sends sends are in flight."""
+    hook_config["max_pending_sends"] = 1
+    hook = TelegramBridgeHook(hook_config)
+
+    release = asyncio.Event()
+
+    async def blocked_send(*args, **kwargs) -> bool:
+        await release.wait()
+        return True
+
+    hook.telegram_client.async_send_message = AsyncMock(side_effect=blocked_send)
+
+    await hook.handle_event("session:start", {"session_id": "first"})
+    await hook.handle_event("session:start", {"session_id": "second"})
+    release.set()
+    await hook.flush()
+
+    assert hook.telegram_client.async_send_message.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_hook_handles_event_batch(hook_config):
+    """Test a batch only sends observed events, returning a result per event."""
+    hook_config["events"] = ["session:start"]
+    hook = TelegramBridgeHook(hook_config)
+    hook.telegram_client.async_send_message = AsyncMock(return_value=True)
+
+    batch = [
+        ("prompt:submit", {"prompt": "a"}),
+        ("session:start", {"session_id": "test-123"}),
+        ("tool:post", {"tool_name": "bash"}),
+    ]
+    results = await hook.handle_events(batch)
+    await hook.flush()
+
+    assert [result.action for result in results] == ["continue"] * 3
+    assert hook.telegram_client.async_send_message.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_hook_caps_chat_event_limits_at_send_pacing(hook_config):
+    """Test per-chat event limits never exceed what the client can pace out."""
+    hook_config["chat_event_rate"] = 10.0
+    hook_config["chat_event_burst"] = 100
+    hook = TelegramBridgeHook(hook_config)
+
+    # 1 msg/s per chat with a burst of 3, plus 5s of send_timeout
+    assert hook.auth_manager.event_rate == 1.0
+    assert hook.auth_manager.event_burst == 8
+
+
+@pytest.mark.asyncio
+async def test_hook_backpressure_keeps_rate_budget(hook_config):
+    """Test events dropped for backpressure don't spend the chat's event tokens."""
+    hook_config["max_pending_sends"] = 1
+    hook_config["chat_event_rate"] = 0.001
+    hook_config["chat_event_burst"] = 2
+    hook = TelegramBridgeHook(hook_config)
+
+    release = asyncio.Event()
+
+    async def blocked_send(*args, **kwargs) -> bool:
+        await release.wait()
+        return True
+
+    hook.telegram_client.async_send_message = AsyncMock(side_effect=blocked_send)
+
+    await hook.handle_event("session:start", {"session_id": "first"})
+    for _ in range(3):
+        await hook.handle_event("session:start", {"session_id": "dropped"})
+    release.set()
+    await hook.flush()
+
+    # The chat still has the second token of its burst
+    await hook.handle_event("session:start", {"session_id": "second"})
+    await hook.flush()
+    assert hook.telegram_client.async_send_message.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_hook_chat_event_rate_is_opt_in(hook_config):
+    """Test no events are dropped per chat unless chat_event_rate is configured."""
+    hook = TelegramBridgeHook(hook_config)
+    hook.telegram_client.async_send_message = AsyncMock(return_value=True)
+
+    for i in range(20):
+        await hook.handle_event("session:start", {"session_id": str(i)})
+    await hook.flush()
+
+    assert hook.telegram_client.async_send_message.call_count == 20
+
+
+@pytest.mark.asyncio
+async def test_hook_skips_throttled_chat_only(hook_config, temp_pairing_file, caplog):
+    """Test a chat over its event rate is skipped (with a warning) while others still get the event."""
+    pairing_data = orjson.loads(temp_pairing_file.read_bytes())
+    pairing_data["authorized_users"].append(
+        {"user_id": 654321, "chat_id": 654321, "username": "other", "paired_at": "2025-01-01T00:00:00Z"}
+    )
+    temp_pairing_file.write_bytes(orjson.dumps(pairing_data, option=orjson.OPT_INDENT_2))
+
+    hook_config["chat_event_rate"] = 0.001
+    hook_config["chat_event_burst"] = 1
+    hook = TelegramBridgeHook(hook_config)
+    hook.telegram_client.async_send_message = AsyncMock(return_value=True)
+
+    # Chat 123456 has already used its only token
+    assert hook.auth_manager.allow(123456)
+
+    with caplog.at_level("WARNING"):
+        await hook.handle_event("session:start", {"session_id": "first"})
+        await hook.handle_event("session:start", {"session_id": "second"})
+    await hook.flush()
+
+    sent_to = [call.args[0] for call in hook.telegram_client.async_send_message.call_args_list]
+    assert sent_to == [654321]
+    # Both chats were throttled by the second event, each warned about once
+    assert sum("over chat_event_rate" in record.message for record in caplog.records) == 2
+
+
+@pytest.mark.asyncio
+async def test_hook_keeps_per_chat_order_across_events(hook_config):
+    """Test a chat receives events in arrival order even when earlier sends are slower."""
+    hook = TelegramBridgeHook(hook_config)
+    hook.message_formatter.format_event = lambda event, data: [data["session_id"]]
+
+    sent = []
+
+    async def uneven_send(chat_id, text) -> bool:
+        # Earlier events take longest, so unordered sends would arrive reversed
+        await asyncio.sleep({"0": 0.15, "1": 0.05, "2": 0}[text])
+        sent.append(text)
+        return True
+
+    hook.telegram_client.async_send_message = uneven_send
+
+    for i in range(3):
+        await hook.handle_event("session:start", {"session_id": str(i)})
+    await hook.flush()
+
+    assert sent == ["0", "1", "2"]
+    assert not hook._chat_tails
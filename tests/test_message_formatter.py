@@ -0,0 +1,82 @@
+"""Tests for MessageFormatter."""
+
+from amplifier_module_hooks_telegram_bridge.message_formatter import MessageFormatter
+
+
+def test_chunk_short_message_unchanged():
+    """Test message under the limit is returned as a single chunk."""
+    assert MessageFormatter._chunk_message("hello\nworld", max_length=20) == ["hello\nworld"]
+
+
+def test_chunk_breaks_at_newlines():
+    """Test chunks break at the last newline that fits."""
+    text = "aaaa\nbbbb\ncccc"
+
+    assert MessageFormatter._chunk_message(text, max_length=10) == ["aaaa\nbbbb", "cccc"]
+    assert MessageFormatter._chunk_message(text, max_length=9) == ["aaaa\nbbbb", "cccc"]
+    assert MessageFormatter._chunk_message(text, max_length=8) == ["aaaa", "bbbb", "cccc"]
+
+
+def test_chunk_splits_long_lines():
+    """Test lines longer than the limit are split at the limit."""
+    text = "x" * 25 + "\nend"
+
+    assert MessageFormatter._chunk_message(text, max_length=10) == ["x" * 10, "x" * 10, "x" * 5 + "\nend"]
+
+
+def test_chunks_respect_limit():
+    """Test every chunk fits and no content other than break newlines is lost."""
+    text = "\n".join(f"line {i} " + "y" * (i % 37) for i in range(400))
+
+    chunks = MessageFormatter._chunk_message(text, max_length=100)
+
+    assert all(0 < len(chunk) <= 100 for chunk in chunks)
+    assert "\n".join(chunks) == text
+
+
+def test_format_event_uses_specific_formatter():
+    """Test known events get their dedicated format."""
+    chunks = MessageFormatter.format_event("session:start", {"session_id": "abc-123"})
+
+    assert chunks == ["🚀 *Session Started*\n\nSession ID: `abc-123`"]
+
+
+def test_format_event_falls_back_to_json():
+    """Test unknown events are formatted as JSON."""
+    chunks = MessageFormatter.format_event("custom:event", {"key": "value"})
+
+    assert chunks[0].startswith("📝 *Event: custom:event*")
+    assert '"key": "value"' in chunks[0]
+
+
+def test_format_event_missing_key_falls_back_to_json():
+    """Test payloads missing an expected key are formatted as JSON."""
+    chunks = MessageFormatter.format_event("tool:post", {"result": "ok"})
+
+    assert chunks[0].startswith("📝 *Event: tool:post*")
+    assert '"result": "ok"' in chunks[0]
+
+
+def test_format_event_bad_value_falls_back_to_json():
+    """Test a value the specific formatter can't handle is formatted as JSON."""
+    chunks = MessageFormatter.format_event("prompt:submit", {"prompt": None})
+
+    assert chunks[0].startswith("📝 *Event: prompt:submit*")
+
+
+def test_format_event_unserializable_payload():
+    """Test payloads with non-JSON values still produce a message."""
+
+    class Opaque:
+        def __str__(self):
+            return "<opaque>"
+
+    chunks = MessageFormatter.format_event("custom:event", {"result": Opaque()})
+    assert '"result": "<opaque>"' in chunks[0]
+
+    # Not even str() works - a short error message is sent instead
+    class Broken:
+        def __str__(self):
+            raise ValueError("no")
+
+    assert MessageFormatter.format_event("custom:event", {"result": Broken()}) == ["❌ Error formatting event: custom:event"]
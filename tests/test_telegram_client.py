@@ -0,0 +1,212 @@
+"""Tests for TelegramClient."""
+
+import asyncio
+import threading
+import time
+import weakref
+
+import pytest
+import responses
+from amplifier_module_hooks_telegram_bridge import telegram_client
+from amplifier_module_hooks_telegram_bridge.telegram_client import TelegramClient
+from amplifier_module_hooks_telegram_bridge.telegram_client import TokenBucket
+
+SEND_URL = "https://api.telegram.org/bottest_token_123/sendMessage"
+
+
+@responses.activate
+def test_send_reuses_session():
+    """Test consecutive sends share one HTTP session."""
+    responses.add(responses.POST, SEND_URL, json={"ok": True}, status=200)
+    client = TelegramClient(bot_token="test_token_123")
+
+    assert client.send_message(123456, "first")
+    session = client.session
+    assert client.send_message(123456, "second")
+
+    assert client.session is session
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_clients_share_session(monkeypatch):
+    """Test clients share one HTTP session until the last of them is closed."""
+    # Isolate from clients other tests left open
+    monkeypatch.setattr(telegram_client, "_SESSION", None)
+    monkeypatch.setattr(telegram_client, "_SESSION_CLIENTS", weakref.WeakSet())
+    responses.add(responses.POST, SEND_URL, json={"ok": True}, status=200)
+    first = TelegramClient(bot_token="test_token_123")
+    second = TelegramClient(bot_token="test_token_123")
+
+    assert first.send_message(123456, "first")
+    assert second.send_message(123456, "second")
+    session = first.session
+    assert second.session is session
+
+    first.close()
+    assert second.session is session
+    second.close()
+    assert TelegramClient(bot_token="test_token_123").session is not session
+
+
+def test_session_created_once_across_threads(monkeypatch):
+    """Test clients racing from several threads still end up on one session."""
+    monkeypatch.setattr(telegram_client, "_SESSION", None)
+    monkeypatch.setattr(telegram_client, "_SESSION_CLIENTS", weakref.WeakSet())
+    clients = [TelegramClient(bot_token="test_token_123") for _ in range(8)]
+    barrier = threading.Barrier(len(clients))
+    sessions = []
+
+    def fetch(client):
+        barrier.wait()
+        sessions.append(client.session)
+
+    threads = [threading.Thread(target=fetch, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 1
+    for client in clients:
+        client.close()
+    assert telegram_client._SESSION is None
+
+
+@responses.activate
+def test_failed_send_is_queued():
+    """Test failed send is queued for retry."""
+    responses.add(responses.POST, SEND_URL, json={"ok": False}, status=500)
+    client = TelegramClient(bot_token="test_token_123")
+
+    assert not client.send_message(123456, "hello")
+    assert client.get_queue_status()["queued_messages"] == 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_after_burst():
+    """Test bucket allows a burst, then waits for refill."""
+    bucket = TokenBucket(rate=10, capacity=2)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    await bucket.acquire()
+    await bucket.acquire()
+    assert loop.time() - started < 0.05
+
+    await bucket.acquire()
+    assert loop.time() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refunds_cancelled_wait():
+    """Test a wait cancelled before its token is due gives the token back."""
+    bucket = TokenBucket(rate=10, capacity=1)
+    loop = asyncio.get_running_loop()
+    await bucket.acquire()
+
+    with pytest.raises(TimeoutError):
+        await asyncio.wait_for(bucket.acquire(), timeout=0.01)
+
+    # Only the first token's debt is left, not the cancelled one's too
+    started = loop.time()
+    await bucket.acquire()
+    assert loop.time() - started < 0.15
+
+
+def test_pacing_delay_tracks_bucket_debt():
+    """Test pacing_delay reports the wait the next send to a chat would see."""
+    client = TelegramClient(bot_token="test_token_123", chat_rate=1, chat_burst=1)
+    assert client.pacing_delay(1) == 0
+
+    bucket = client._chat_buckets[1] = TokenBucket(rate=1, capacity=1)
+    bucket.credit_ns = -1_000_000_000
+
+    assert 1.9 < client.pacing_delay(1) <= 2.0
+    assert client.pacing_delay(2) == 0
+
+
+class _Sent:
+    status_code = 200
+
+
+@pytest.mark.asyncio
+async def test_send_cancelled_while_pacing_is_queued():
+    """Test a send cancelled before its request went out is queued for retry."""
+    client = TelegramClient(bot_token="test_token_123", chat_rate=10, chat_burst=1)
+    client._post = lambda *args: _Sent()
+    assert await client.async_send_message(1, "first")
+
+    with pytest.raises(TimeoutError):
+        await asyncio.wait_for(client.async_send_message(1, "second"), timeout=0.01)
+
+    assert list(client._q_text) == ["second"]
+
+
+@pytest.mark.asyncio
+async def test_send_cancelled_in_flight_is_not_queued_twice():
+    """Test a send cancelled mid-request is only queued if that request fails."""
+    client = TelegramClient(bot_token="test_token_123")
+
+    def slow_post(session, chat_id, text, parse_mode):
+        time.sleep(0.1)
+        return _Sent() if text == "delivered" else None
+
+    client._post = slow_post
+
+    for text in ("delivered", "failed"):
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(client.async_send_message(1, text), timeout=0.01)
+    await asyncio.sleep(0.3)
+
+    assert list(client._q_text) == ["failed"]
+
+
+@pytest.mark.asyncio
+@responses.activate
+async def test_async_send_honours_retry_after():
+    """Test 429 is retried after retry_after instead of being queued."""
+    responses.add(
+        responses.POST,
+        SEND_URL,
+        json={"ok": False, "error_code": 429, "parameters": {"retry_after": 0.1}},
+        status=429,
+    )
+    responses.add(responses.POST, SEND_URL, json={"ok": True}, status=200)
+    client = TelegramClient(bot_token="test_token_123")
+
+    assert await client.async_send_message(123456, "hello")
+    assert len(responses.calls) == 2
+    assert client.get_queue_status()["queued_messages"] == 0
+
+
+@pytest.mark.asyncio
+@responses.activate
+async def test_retry_queue_backs_off_concurrently():
+    """Test queued messages wait out their backoff in parallel."""
+    responses.add(responses.POST, SEND_URL, json={"ok": True}, status=200)
+    client = TelegramClient(bot_token="test_token_123")
+    client.base_backoff = 0.2
+    client._queue_message(1, "first")
+    client._queue_message(2, "second")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await client.retry_queue() == 2
+
+    assert loop.time() - started < 0.35
+    assert client.get_queue_status()["queued_messages"] == 0
+
+
+@pytest.mark.asyncio
+@responses.activate
+async def test_retry_queue_requeues_failures_once():
+    """Test a failed retry is re-queued once with its retry count bumped."""
+    responses.add(responses.POST, SEND_URL, json={"ok": False}, status=500)
+    client = TelegramClient(bot_token="test_token_123")
+    client.base_backoff = 0
+    client._queue_message(1, "hello")
+
+    assert await client.retry_queue() == 0
+
+    assert list(client._q_retry) == [1]